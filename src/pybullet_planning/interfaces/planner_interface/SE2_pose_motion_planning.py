@@ -57,6 +57,6 @@ def plan_base_motion(body, end_conf, base_limits, obstacles=[], direct=False,
         print("Warning: end configuration is in collision")
         return None
     if direct:
-        return direct_path(start_conf, end_conf, extend_fn, collision_fn)
+        return direct_path(start_conf, end_conf, extend_fn, collision_fn, _endpoints_checked=True)
     return birrt(start_conf, end_conf, distance_fn,
-                 sample_fn, extend_fn, collision_fn, **kwargs)
+                 sample_fn, extend_fn, collision_fn, _endpoints_checked=True, **kwargs)
@@ -20,9 +20,19 @@ def uniform_generator(d):
     while True:
         yield np.random.uniform(size=d)
 
-def halton_generator(d):
-    import ghalton
+def halton_generator(d, batch_size=1024):
+    """low-discrepancy samples in the unit hypercube, using ``ghalton`` if installed,
+    otherwise ``scipy.stats.qmc.Halton`` (drawn in batches of ``batch_size``).
+    """
     seed = random.randint(0, 1000)
+    try:
+        import ghalton
+    except ImportError:
+        from scipy.stats import qmc
+        sequencer = qmc.Halton(d=d, scramble=True, seed=seed)
+        while True:
+            for weights in sequencer.random(batch_size):
+                yield weights
     #sequencer = ghalton.Halton(d)
     sequencer = ghalton.GeneralizedHalton(d, seed)
     #sequencer.reset()
@@ -35,8 +45,11 @@ def unit_generator(d, use_halton=False):
         try:
             import ghalton
         except ImportError:
-            print('ghalton is not installed (https://pypi.org/project/ghalton/)')
-            use_halton = False
+            try:
+                from scipy.stats import qmc
+            except ImportError:
+                print('Neither ghalton (https://pypi.org/project/ghalton/) nor scipy>=1.7 is installed')
+                use_halton = False
     return halton_generator(d) if use_halton else uniform_generator(d)
 
 def interval_generator(lower, upper, **kwargs):
@@ -76,6 +89,21 @@ def get_distance_fn(body, joints, weights=None): #, norm=2):
         #return np.linalg.norm(np.multiply(weights * diff), ord=norm)
     return fn
 
+def get_embed_fn(body, joints, weights=None):
+    """get an embedding fn under which the L2 distance agrees with ``get_distance_fn``,
+    used by ``birrt`` for KD-tree nearest neighbor queries.
+    Returns None if any of the joints is circular, since the wrap-around difference cannot be embedded this way.
+    """
+    from pybullet_planning.interfaces.robots.joint import is_circular
+    if any(is_circular(body, joint) for joint in joints):
+        return None
+    if weights is None:
+        weights = 1*np.ones(len(joints))
+    scales = np.sqrt(weights)
+    def fn(q):
+        return scales * np.array(q)
+    return fn
+
 def get_refine_fn(body, joints, num_steps=0):
     difference_fn = get_difference_fn(body, joints)
     num_steps = num_steps + 1
@@ -106,6 +134,15 @@ def get_extend_fn(body, joints, resolutions=None, norm=2):
         steps = int(np.ceil(np.linalg.norm(np.divide(difference_fn(q2, q1), resolutions), ord=norm)))
         refine_fn = get_refine_fn(body, joints, num_steps=steps)
         return refine_fn(q1, q2)
+    def vectorized_fn(q1, q2):
+        # same configurations as fn, computed at once as a (steps + 2, d) array
+        difference = np.array(difference_fn(q2, q1))
+        steps = int(np.ceil(np.linalg.norm(np.divide(difference, resolutions), ord=norm)))
+        t = np.linspace(0., 1., steps + 2)[:, None]
+        return np.array(q1, dtype=float) + t * difference
+    # interpolating from q2 to q1 gives the same path reversed, so planners can skip reversing it
+    fn.symmetric = True
+    fn.vectorized = vectorized_fn
     return fn
 
 def remove_redundant(path, tolerance=1e-3):
@@ -207,6 +244,7 @@ def plan_joint_motion(body, joints, end_conf, obstacles=[], attachments=[],
     assert len(joints) == len(end_conf)
     sample_fn = get_sample_fn(body, joints, custom_limits=custom_limits)
     distance_fn = get_distance_fn(body, joints, weights=weights)
+    kwargs.setdefault('embed_fn', get_embed_fn(body, joints, weights=weights))
     extend_fn = get_extend_fn(body, joints, resolutions=resolutions)
     collision_fn = get_collision_fn(body, joints, obstacles=obstacles, attachments=attachments, self_collisions=self_collisions,
                                     disabled_collisions=disabled_collisions, extra_disabled_collisions=extra_disabled_collisions,
@@ -216,7 +254,8 @@ def plan_joint_motion(body, joints, end_conf, obstacles=[], attachments=[],
 
     if not check_initial_end(start_conf, end_conf, collision_fn, diagnosis=diagnosis):
         return None
-    return birrt(start_conf, end_conf, distance_fn, sample_fn, extend_fn, collision_fn, **kwargs)
+    return birrt(start_conf, end_conf, distance_fn, sample_fn, extend_fn, collision_fn, _endpoints_checked=True,
+                 **kwargs)
     #return plan_lazy_prm(start_conf, end_conf, sample_fn, extend_fn, collision_fn)
 
 def plan_lazy_prm(start_conf, end_conf, sample_fn, extend_fn, collision_fn, **kwargs):
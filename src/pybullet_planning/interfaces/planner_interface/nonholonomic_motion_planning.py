@@ -71,4 +71,5 @@ def plan_nonholonomic_motion(body, joints, end_conf, obstacles=[], attachments=[
     start_conf = get_joint_positions(body, joints)
     if not check_initial_end(start_conf, end_conf, collision_fn):
         return None
-    return birrt(start_conf, end_conf, distance_fn, sample_fn, extend_fn, collision_fn, **kwargs)
+    return birrt(start_conf, end_conf, distance_fn, sample_fn, extend_fn, collision_fn, _endpoints_checked=True,
+                 **kwargs)
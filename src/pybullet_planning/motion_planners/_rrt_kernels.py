@@ -0,0 +1,93 @@
+"""Array kernels used by :class:`Tree`.
+
+The loops below are compiled with numba (https://numba.pydata.org/) if it is installed. Otherwise the
+``_numpy`` implementations are used where numpy has a faster equivalent, and the plain loops elsewhere.
+The first call of a compiled kernel pays the compilation cost, which is cached on disk.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    USE_NUMBA = True
+except ImportError:
+    USE_NUMBA = False
+
+def _nearest_idx(configs, n, target):
+    """Index of the row of ``configs[:n]`` closest to ``target`` under the L2 distance, with ``n >= 1``.
+    """
+    # start from the first row rather than an infinite distance, so that an index is always returned
+    best_index = 0
+    best_distance = 0.
+    for j in range(target.shape[0]):
+        delta = configs[0, j] - target[j]
+        best_distance += delta * delta
+    for i in range(1, n):
+        distance = 0.
+        for j in range(target.shape[0]):
+            delta = configs[i, j] - target[j]
+            distance += delta * delta
+        if distance < best_distance:
+            best_distance = distance
+            best_index = i
+    return best_index
+
+def _nearest_idx_numpy(configs, n, target):
+    difference = configs[:n] - target
+    return int(np.einsum('ij,ij->i', difference, difference).argmin())
+
+def _append_nodes(configs, parents, depths, n, new_qs, parent_idx, tree_frequency):
+    """Append ``new_qs`` as a chain rooted at ``parent_idx`` into ``configs[n:]``, ``parents[n:]`` and
+    ``depths[n:]``, keeping every ``tree_frequency``-th configuration and the last one.
+    Returns the new number of nodes and the index of the last appended node.
+    """
+    last = parent_idx
+    num_qs = new_qs.shape[0]
+    for i in range(num_qs):
+        if (i % tree_frequency == 0) or (i == num_qs - 1):
+            configs[n] = new_qs[i]
+            parents[n] = last
+            depths[n] = depths[last] + 1
+            last = n
+            n += 1
+    return n, last
+
+def _append_nodes_numpy(configs, parents, depths, n, new_qs, parent_idx, tree_frequency):
+    num_qs = len(new_qs)
+    kept = np.arange(0, num_qs, tree_frequency)
+    if kept[-1] != num_qs - 1:
+        kept = np.append(kept, num_qs - 1)
+    indices = np.arange(n, n + len(kept))
+    configs[indices] = new_qs[kept]
+    parents[indices[0]] = parent_idx
+    parents[indices[1:]] = indices[:-1]
+    depths[indices] = depths[parent_idx] + np.arange(1, len(kept) + 1)
+    return n + len(kept), int(indices[-1])
+
+def _path_indices(parents, depths, index):
+    """Indices of the nodes from the root to node ``index``.
+    """
+    sequence = np.empty(depths[index] + 1, dtype=np.int32)
+    for k in range(sequence.shape[0] - 1, -1, -1):
+        sequence[k] = index
+        index = parents[index]
+    return sequence
+
+def _subtree_mask(parents, n, index):
+    """Mask of node ``index`` and its descendants among the first ``n`` nodes,
+    relying on parents being added before their children.
+    """
+    mask = np.zeros(n, dtype=np.bool_)
+    mask[index] = True
+    for i in range(index + 1, n):
+        mask[i] = mask[parents[i]]
+    return mask
+
+if USE_NUMBA:
+    nearest_idx = njit(cache=True)(_nearest_idx)
+    append_nodes = njit(cache=True)(_append_nodes)
+    path_indices = njit(cache=True)(_path_indices)
+    subtree_mask = njit(cache=True)(_subtree_mask)
+else:
+    nearest_idx, append_nodes = _nearest_idx_numpy, _append_nodes_numpy
+    # these loops have no faster numpy equivalent
+    path_indices, subtree_mask = _path_indices, _subtree_mask
@@ -1,8 +1,11 @@
 """unified entry API for calling different planners
 """
+import random
 import time
+import numpy as np
 
 from .lattice import lattice
+from .primitives import batch_safe_length
 from .lazy_prm import lazy_prm
 from .prm import prm
 from .rrt import rrt
@@ -14,31 +17,42 @@ from .smoothing import smooth_path
 from .utils import RRT_RESTARTS, RRT_SMOOTHING, INF, irange, elapsed_time, compute_path_cost, default_selector, get_pairs, \
     remove_redundant
 
-def direct_path(start, goal, extend_fn, collision_fn, sweep_collision_fn=None, diagnosis=False, **kwargs):
+def direct_path(start, goal, extend_fn, collision_fn, sweep_collision_fn=None, batch_collision_fn=None,
+                diagnosis=False, _endpoints_checked=False, **kwargs):
     """direct linear path connnecting start and goal using the extension fn.
+    Configurations are checked in bisection order, so that a collision is typically found after a few checks.
 
     :param start: Start configuration - conf
     :param goal: End configuration - conf
     :param extend_fn: Extension function - extend_fn(q1, q2)->[q', ..., q"]
     :param collision_fn: Collision function - collision_fn(q)->bool
     :param sweep_collision_fn (Optional): Sweep collision function - collision_fn(q0, q1)->bool
+    :param batch_collision_fn (Optional): Batched collision function - batch_collision_fn(qs)->np.array(bool)
+    :param _endpoints_checked (Optional): skip checking start and goal, if the caller already did
     :return: Path [q', ..., q"] or None if unable to find a solution
     """
     # TODO: version which checks whether the segment is valid
-    if collision_fn(start) or collision_fn(goal):
+    if not _endpoints_checked and (collision_fn(start) or collision_fn(goal)):
         return None
     path = list(extend_fn(start, goal))
-    if any(collision_fn(q, diagnosis=diagnosis) for q in default_selector(path)):
+    # start and goal are known to be collision-free, skip them if the extension includes them
+    lower = 1 if path and np.array_equal(path[0], start) else 0
+    upper = len(path) - 1 if len(path) > lower and np.array_equal(path[-1], goal) else len(path)
+    interior = list(default_selector(path[lower:upper]))
+    if batch_collision_fn is not None:
+        if batch_safe_length(interior, batch_collision_fn) < len(interior):
+            return None
+    elif any(collision_fn(q, diagnosis=diagnosis) for q in interior):
         return None
     if sweep_collision_fn is not None:
         if any(sweep_collision_fn(q0, q1, diagnosis=diagnosis) for q0, q1 in default_selector(get_pairs(path))):
             return None
     return path
 
-def check_direct(start, goal, extend_fn, collision_fn, **kwargs):
-    if any(collision_fn(q) for q in [start, goal]):
+def check_direct(start, goal, extend_fn, collision_fn, _endpoints_checked=False, **kwargs):
+    if not _endpoints_checked and any(collision_fn(q) for q in [start, goal]):
         return False
-    return direct_path(start, goal, extend_fn, collision_fn, **kwargs)
+    return direct_path(start, goal, extend_fn, collision_fn, _endpoints_checked=True, **kwargs)
 
 #################################################################
 
@@ -112,6 +126,100 @@ def random_restarts(solve_fn, start, goal, distance_fn, sample_fn, extend_fn, co
             path, distance_fn), 3)) for path in solutions], elapsed_time(start_time)))
     return solutions
 
+def _solve_restart(seed, solve_fn, start, goal, distance_fn, sample_fn, extend_fn, collision_fn, smooth, max_time,
+                   kwargs):
+    # runs in a worker process of parallel_restarts
+    start_time = time.time()
+    random.seed(seed)
+    np.random.seed(seed)
+    path = solve_fn(start, goal, distance_fn, sample_fn, extend_fn, collision_fn, max_time=max_time, **kwargs)
+    if path is None:
+        return None
+    return smooth_path(path, extend_fn, collision_fn, max_smooth_iterations=smooth,
+                       max_time=max_time-elapsed_time(start_time), **kwargs)
+
+def parallel_restarts(solve_fn, start, goal, distance_fn, sample_fn, extend_fn, collision_fn, workers=None,
+                      restarts=RRT_RESTARTS, smooth=RRT_SMOOTHING, max_time=INF, initializer=None, initargs=(),
+                      verbose=False, **kwargs):
+    """Run the random restarts of ``random_restarts`` in parallel processes and return the first solution found.
+    Once a solution is found or ``max_time`` is up, the worker processes are terminated.
+
+    All the function handles are sent to the worker processes, so they must be picklable (e.g. module-level
+    functions). Collision functions relying on pybullet need a connection in each worker, which can be set up by
+    ``initializer``.
+
+    Parameters
+    ----------
+    solve_fn : function handle
+        motion planner function, e.g. ``rrt_connect``
+    start : list
+        start conf
+    goal : list
+        end conf
+    distance_fn, sample_fn, extend_fn, collision_fn : function handle
+        see ``random_restarts``
+    workers : int, optional
+        number of worker processes, by default None, using the number of processors
+    restarts : int, optional
+        number of random restarts, by default RRT_RESTARTS
+    smooth : int, optional
+        smoothing iterations, by default RRT_SMOOTHING
+    max_time : float, optional
+        max allowed runtime of all the restarts together, by default INF
+    initializer : function handle, optional
+        called as ``initializer(*initargs)`` when each worker process starts, by default None
+    initargs : tuple, optional
+        arguments of ``initializer``, by default ()
+    verbose : bool, optional
+        print toggle, by default False
+
+    Returns
+    -------
+    list
+        list of paths, containing at most one path
+    """
+    from multiprocessing import Pool
+    from queue import Queue, Empty
+    start_time = time.time()
+    deadline = time.monotonic() + max_time
+    path = check_direct(start, goal, extend_fn, collision_fn, **kwargs)
+    if path is False:
+        return None
+    if path is not None:
+        return [path]
+
+    # results (or exceptions) of the restarts, in order of completion
+    results = Queue()
+    pool = Pool(processes=workers, initializer=initializer, initargs=initargs)
+    solutions = []
+    try:
+        for _ in irange(restarts + 1):
+            pool.apply_async(_solve_restart, (random.randint(0, 2**32 - 1), solve_fn, start, goal, distance_fn,
+                                              sample_fn, extend_fn, collision_fn, smooth,
+                                              deadline - time.monotonic(), kwargs),
+                             callback=results.put, error_callback=results.put)
+        for _ in irange(restarts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                path = results.get(timeout=None if remaining == INF else remaining)
+            except Empty:
+                break
+            if isinstance(path, BaseException):
+                raise path
+            if path is not None:
+                solutions.append(path)
+                break
+    finally:
+        # stop the restarts still running or waiting for a worker
+        pool.terminate()
+        pool.join()
+    if verbose:
+        print('Solutions ({}): {} | Time: {:.3f}'.format(len(solutions), [(len(path), round(compute_path_cost(
+            path, distance_fn), 3)) for path in solutions], elapsed_time(start_time)))
+    return solutions
+
 def solve_and_smooth(solve_fn, q1, q2, distance_fn, sample_fn, extend_fn, collision_fn, **kwargs):
     """plan and smooth without random restarting.
     """
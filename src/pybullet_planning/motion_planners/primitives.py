@@ -1,46 +1,76 @@
-from itertools import takewhile
-
-from .rrt import TreeNode
-from .utils import argmin, negate, get_pairs
+import numpy as np
 
 ASYMETRIC = True
+# number of configurations passed to a `batch_collision_fn` at once
+COLLISION_BATCH_SIZE = 100
 
 
 def asymmetric_extend(q1, q2, extend_fn, backward=False):
-    if backward and ASYMETRIC:
-        return reversed(list(extend_fn(q2, q1))) # Forward model
+    """Extend from `q1` towards `q2`. If `backward`, the path is generated from `q2` to `q1` and reversed, unless
+    `extend_fn` is marked as `symmetric` (i.e. `extend_fn.symmetric = True`), in which case the lazy forward
+    extension is used directly.
+
+    If `extend_fn` has a `vectorized` attribute - `extend_fn.vectorized(q1, q2)->np.array` returning the same
+    configurations as an `(N, d)` array - it is used instead, and backward paths are reversed as array views.
+    """
+    vectorized_fn = getattr(extend_fn, 'vectorized', None)
+    if backward and ASYMETRIC and not getattr(extend_fn, 'symmetric', False):
+        if vectorized_fn is not None:
+            return vectorized_fn(q2, q1)[::-1]
+        path = list(extend_fn(q2, q1)) # Forward model
+        path.reverse()
+        return path
+    if vectorized_fn is not None:
+        return vectorized_fn(q1, q2)
     return extend_fn(q1, q2)
 
 
+def batch_safe_length(path, batch_collision_fn, batch_size=COLLISION_BATCH_SIZE):
+    """Count the collision-free configurations at the start of `path`, checking them in chunks of `batch_size`
+    with `batch_collision_fn(qs)->np.array(bool)`. Stops at the first chunk that contains a collision.
+    """
+    qs = np.asarray(path)
+    for start in range(0, len(qs), batch_size):
+        mask = np.asarray(batch_collision_fn(qs[start:start+batch_size]), dtype=bool)
+        if mask.any():
+            return start + int(mask.argmax())
+    return len(qs)
+
+
 def extend_towards(tree, target, distance_fn, extend_fn, collision_fn, swap=False, tree_frequency=1,
-        sweep_collision_fn=None, **kwargs):
-    """Takes current tree and extend it towards a new node (`target`).
+        sweep_collision_fn=None, batch_collision_fn=None, lazy=False, **kwargs):
+    """Takes current tree (a :class:`Tree`) and extend it towards a new node (`target`).
+    Returns the index of the last node added to the tree and whether `target` was reached.
+    If `batch_collision_fn(qs)->np.array(bool)` is given, the extended configurations are checked in batches
+    instead of one `collision_fn` call per configuration (ignored if `sweep_collision_fn` is given).
+    If `lazy`, the extension is not collision checked, the nodes are added as unchecked instead.
     """
     assert tree_frequency >= 1
+    # tree configurations are stored as arrays, convert the target once rather than in every distance_fn call
+    target = np.asarray(target, dtype=float)
     # the nearest node in the tree to the target
     # the segments by connecting last to the target using the given extend fn
-    last = argmin(lambda n: distance_fn(n.config, target), tree)
-    extend = list(asymmetric_extend(last.config, target, extend_fn, backward=swap))
+    last = tree.nearest(target, distance_fn)
+    extend = asymmetric_extend(tree.configs[last], target, extend_fn, backward=swap)
     # check if the extended path collision-free, stop until find a collision
-    if sweep_collision_fn is None:
-        safe = list(takewhile(negate(collision_fn), extend))
+    if lazy:
+        safe = extend if isinstance(extend, np.ndarray) else list(extend)
+        success = True
+    elif sweep_collision_fn is None and batch_collision_fn is not None:
+        if not isinstance(extend, np.ndarray):
+            extend = list(extend)
+        safe = extend[:batch_safe_length(extend, batch_collision_fn)]
+        success = len(extend) == len(safe)
     else:
+        # the extension is consumed lazily, configurations after the first collision are never generated
         safe = []
-        for q0, q1 in get_pairs(extend):
-            if not collision_fn(q0):
-                safe.append(q0)
-                if sweep_collision_fn(q0, q1):
-                    break
-            else:
+        success = True
+        for q in extend:
+            if collision_fn(q) or (sweep_collision_fn is not None and safe and sweep_collision_fn(safe[-1], q)):
+                success = False
                 break
-        else:
-            if not collision_fn(extend[-1]):
-                safe.append(extend[-1])
-    for i, q in enumerate(safe):
-        if (i % tree_frequency == 0) or (i == len(safe) - 1):
-            last = TreeNode(q, parent=last)
-            tree.append(last)
-    success = len(extend) == len(safe)
+            safe.append(q)
+    last = tree.extend(safe, last, tree_frequency=tree_frequency, checked=not lazy)
     return last, success
 
 ##################################
@@ -1,8 +1,9 @@
 import time
+import numpy as np
 
 from .primitives import extend_towards
-from .rrt import TreeNode, configs
-from .utils import irange, RRT_ITERATIONS, INF, elapsed_time
+from .tree import Tree, NodePool
+from .utils import irange, RRT_ITERATIONS, INF
 
 __all__ = [
     'rrt_connect',
@@ -11,7 +12,8 @@ __all__ = [
 
 def rrt_connect(q1, q2, distance_fn, sample_fn, extend_fn, collision_fn,
                 max_iterations=RRT_ITERATIONS, max_time=INF, verbose=False,
-                draw_fn=None, enforce_alternate=False, **kwargs):
+                draw_fn=None, enforce_alternate=False, embed_fn=None, cell_size=None, pool=None, lazy=False,
+                goal_probability=0., _endpoints_checked=False, **kwargs):
     """RRT connect algorithm: http://www.kuffner.org/james/papers/kuffner_icra2000.pdf
 
     Parameters
@@ -41,57 +43,96 @@ def rrt_connect(q1, q2, distance_fn, sample_fn, extend_fn, collision_fn,
         By default 1
     max_time : float, optional
         maximal allowed runtime, by default INF
+    embed_fn : function handle, optional
+        Embedding function - `embed_fn(q)->np.array`, mapping a configuration into a space where the L2 distance
+        agrees with `distance_fn`, e.g. `lambda q: np.sqrt(weights) * q` for a weighted euclidean distance.
+        If given, nearest neighbors are queried using a KD-tree instead of a linear scan over the tree.
+        By default None
+    batch_collision_fn : function handle, optional
+        Batched collision function - `batch_collision_fn(qs)->np.array(bool)`, checking an `(N, d)` array of
+        configurations at once. If given, it replaces `collision_fn` when checking tree extensions.
+        By default None
+    cell_size : float, optional
+        If given (together with `embed_fn`), nearest neighbors are queried using a spatial hash with this cell size
+        instead of a KD-tree. A good choice is the typical step of `extend_fn`. This can be faster than the KD-tree
+        in low dimensions (e.g. 2D), while in higher dimensions the KD-tree is usually faster.
+        By default None
+    pool : NodePool, optional
+        preallocated tree storage to reuse, e.g. across restarts. By default None, which allocates new trees.
+    lazy : bool, optional
+        If True, tree extensions are not collision checked. Only the nodes along a candidate path connecting the
+        two trees are checked, and the first node found in collision is removed with its descendants.
+        Requires `tree_frequency=1` and no `sweep_collision_fn`. By default False
+    goal_probability : float, optional
+        probability of extending the smaller tree towards the last node added to the other tree (initially its root)
+        instead of towards a new sample. It is drawn from `np.random`, like the samplers, so seeding `np.random`
+        keeps runs reproducible. By default 0., i.e. no bias
 
     Returns
     -------
-    list(list(float))
+    list(np.array)
         the computed path, i.e. a list of configurations
         return None if no plan is found.
     """
-    start_time = time.time()
-    if collision_fn(q1) or collision_fn(q2):
+    # a single monotonic deadline, compared once per iteration
+    deadline = time.monotonic() + max_time
+    if not _endpoints_checked and (collision_fn(q1) or collision_fn(q2)):
         return None
-    nodes1, nodes2 = [TreeNode(q1)], [TreeNode(q2)]
+    assert not lazy or (kwargs.get('tree_frequency', 1) == 1 and kwargs.get('sweep_collision_fn') is None), \
+        'Lazy collision checking only checks tree nodes'
+    if pool is None:
+        nodes1, nodes2 = Tree(q1, embed_fn=embed_fn, cell_size=cell_size), Tree(q2, embed_fn=embed_fn, cell_size=cell_size)
+    else:
+        nodes1, nodes2 = pool.get_trees(q1, q2, embed_fn=embed_fn, cell_size=cell_size)
     for iteration in irange(max_iterations):
-        if max_time <= elapsed_time(start_time):
+        if deadline <= time.monotonic():
             break
         if enforce_alternate:
-            swap = iteration % 2
+            swap = bool(iteration % 2)
         else:
             swap = len(nodes1) > len(nodes2)
-        tree1, tree2 = nodes1, nodes2
-        if swap:
-            # keep tree1 as the smaller tree, trying to connect with the new sample
-            # tree 2 tries to connect with tree1
-            tree1, tree2 = nodes2, nodes1
+        # keep tree1 as the smaller tree, trying to connect with the new sample
+        # tree 2 tries to connect with tree1
+        tree1, tree2 = (nodes2, nodes1) if swap else (nodes1, nodes2)
+        not_swap = not swap
 
-        target = sample_fn()
+        # goal bias: the other tree's frontier is a target it can be connected to
+        if goal_probability and np.random.random() < goal_probability:
+            target = tree2.configs[len(tree2) - 1]
+        else:
+            target = sample_fn()
         if draw_fn:
             # draw samples
             draw_fn(target, [])
 
         last1, _ = extend_towards(tree1, target, distance_fn, extend_fn, collision_fn,
-                                  swap, **kwargs)
-        last2, success = extend_towards(tree2, last1.config, distance_fn, extend_fn, collision_fn,
-                                        not swap, **kwargs)
+                                  swap, lazy=lazy, **kwargs)
+        last2, success = extend_towards(tree2, tree1.configs[last1], distance_fn, extend_fn, collision_fn,
+                                        not_swap, lazy=lazy, **kwargs)
 
         if draw_fn:
-            for sp1, sp2 in zip(tree1, tree2):
-                sp1.draw(draw_fn)
-                sp2.draw(draw_fn)
+            tree1.draw(draw_fn)
+            tree2.draw(draw_fn)
+
+        if success and lazy:
+            # check both halves of the candidate path, pruning the trees where they collide
+            valid = [tree1.validate(last1, collision_fn), tree2.validate(last2, collision_fn)]
+            success = all(valid)
 
         if success:
-            path1, path2 = last1.retrace(), last2.retrace()
+            path1, path2 = tree1.retrace(last1), tree2.retrace(last2)
             if swap:
                 path1, path2 = path2, path1
             if verbose:
                 print('RRT connect: {} iterations, {} nodes'.format(iteration, len(nodes1) + len(nodes2)))
-            return configs(path1[:-1] + path2[::-1])
+            # the trees are internal arrays, return configurations as tuples like the samplers
+            return [tuple(q) for q in np.concatenate([path1[:-1], path2[::-1]]).tolist()]
     return None
 
 #################################################################
 
-def birrt(start, goal, distance_fn, sample_fn, extend_fn, collision_fn, **kwargs):
+def birrt(start, goal, distance_fn, sample_fn, extend_fn, collision_fn, workers=None, _endpoints_checked=False,
+          **kwargs):
     """
     :param start: Start configuration - conf
     :param goal: End configuration - conf
@@ -99,12 +140,23 @@ def birrt(start, goal, distance_fn, sample_fn, extend_fn, collision_fn, **kwargs
     :param sample_fn: Sample function - sample_fn()->conf
     :param extend_fn: Extension function - extend_fn(q1, q2)->[q', ..., q"]
     :param collision_fn: Collision function - collision_fn(q)->bool
-    :param kwargs: Keyword arguments
+    :param workers: If not None, run the random restarts in this many parallel processes and return the first
+        solution found, see `parallel_restarts` (the functions must be picklable, use `initializer` to connect
+        each worker to pybullet). By default None, running the restarts sequentially.
+    :param kwargs: Keyword arguments, e.g. `embed_fn` and `batch_collision_fn` (see `rrt_connect`)
     :return: Path [q', ..., q"] or None if unable to find a solution
     """
-    from .meta import random_restarts
-    solutions = random_restarts(rrt_connect, start, goal, distance_fn, sample_fn, extend_fn, collision_fn,
-                                max_solutions=1, **kwargs)
+    from .meta import random_restarts, parallel_restarts
+    if not _endpoints_checked and (collision_fn(start) or collision_fn(goal)):
+        return None
+    if workers is not None:
+        solutions = parallel_restarts(rrt_connect, start, goal, distance_fn, sample_fn, extend_fn, collision_fn,
+                                      workers=workers, _endpoints_checked=True, **kwargs)
+    else:
+        # the tree buffers are shared by all restarts
+        kwargs.setdefault('pool', NodePool())
+        solutions = random_restarts(rrt_connect, start, goal, distance_fn, sample_fn, extend_fn, collision_fn,
+                                    max_solutions=1, _endpoints_checked=True, **kwargs)
     if not solutions:
         return None
     return solutions[0]
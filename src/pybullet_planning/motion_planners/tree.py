@@ -0,0 +1,277 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from ._rrt_kernels import nearest_idx, append_nodes, path_indices, subtree_mask
+from .utils import argmin, INF
+
+
+class SpatialHash(object):
+    """Nearest neighbor structure bucketing points into a uniform grid of cubic cells, giving O(1) insertions.
+
+    A query computes a lower bound of the distance to each occupied bucket, and only scans the points of the buckets
+    that can be closer than the best point found in the query's own bucket (or in the bucket with the lowest bound).
+    Queries stay linear in the number of buckets, so this mostly pays off in low dimensions where buckets hold
+    many points. In higher dimensions the KD-tree is usually faster.
+
+    Parameters
+    ----------
+    cell_size : float
+        edge length of the grid cells, a good choice is the typical step of the extension function
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.bucket_from_key = {}
+        # node indices in each bucket
+        self.members = []
+        # integer cell coordinates of each bucket
+        self.keys = None
+
+    def insert(self, point, index):
+        key = np.floor(point / self.cell_size).astype(int)
+        bucket = self.bucket_from_key.get(tuple(key))
+        if bucket is None:
+            bucket = len(self.members)
+            if self.keys is None:
+                self.keys = np.empty((64, len(key)), dtype=int)
+            elif bucket == len(self.keys):
+                self.keys = np.concatenate([self.keys, np.empty_like(self.keys)])
+            self.keys[bucket] = key
+            self.bucket_from_key[tuple(key)] = bucket
+            self.members.append([])
+        self.members[bucket].append(index)
+
+    def _scan(self, points, point, buckets):
+        indices = np.array([index for bucket in buckets for index in self.members[bucket]])
+        i = nearest_idx(points[indices], len(indices), point)
+        difference = points[indices[i]] - point
+        return difference.dot(difference), int(indices[i])
+
+    def nearest(self, points, point):
+        """Find the index of the inserted row of ``points`` closest to ``point``.
+        """
+        key = np.floor(point / self.cell_size)
+        # squared distance from the query to the cell of each bucket
+        lower = self.keys[:len(self.members)] * self.cell_size
+        gaps = np.maximum(np.maximum(lower - point, point - (lower + self.cell_size)), 0.)
+        bounds = np.einsum('ij,ij->i', gaps, gaps)
+        bucket = self.bucket_from_key.get(tuple(key.astype(int)))
+        if bucket is None:
+            bucket = int(bounds.argmin())
+        best_distance, best_index = self._scan(points, point, [bucket])
+        bounds[bucket] = INF
+        candidates = np.flatnonzero(bounds < best_distance)
+        if len(candidates) != 0:
+            distance, index = self._scan(points, point, candidates)
+            if distance < best_distance:
+                best_index = index
+        return best_index
+
+
+class Tree(object):
+    """A growing search tree stored as contiguous arrays, supporting nearest neighbor queries.
+
+    Node ``i`` has configuration ``configs[i]``, parent ``parents[i]`` (-1 for the root) and depth ``depths[i]``,
+    so nodes are referred to by their integer index. Buffers are preallocated and doubled on demand.
+    ``checked[i]`` tells whether the node is known to be collision-free, nodes added without collision checking
+    (lazy planning) can be validated later with :meth:`validate`.
+
+    If ``embed_fn`` is given, node configurations are also embedded into a contiguous buffer and the
+    nearest node is found with a lazily rebuilt KD-tree, or with a :class:`SpatialHash` if ``cell_size`` is given.
+    This assumes that the L2 distance between embedded configurations agrees with the planner's ``distance_fn``.
+    Otherwise, the nearest node is found by a linear scan using ``distance_fn``.
+
+    Parameters
+    ----------
+    root : list
+        root configuration of the tree
+    embed_fn : function handle, optional
+        Embedding function - ``embed_fn(q)->np.array``, by default None
+    capacity : int, optional
+        initial number of nodes allocated, by default 1024
+    cell_size : float, optional
+        cell size of the spatial hash used instead of the KD-tree, requires ``embed_fn``. By default None
+    """
+
+    def __init__(self, root, embed_fn=None, capacity=1024, cell_size=None):
+        assert (cell_size is None) or (embed_fn is not None), 'A spatial hash requires an embed_fn'
+        root = np.asarray(root, dtype=float)
+        self.embed_fn = embed_fn
+        self.cell_size = cell_size
+        self.configs = np.empty((capacity, len(root)))
+        self.parents = np.empty(capacity, dtype=np.int32)
+        self.depths = np.empty(capacity, dtype=np.int32)
+        self.checked = np.empty(capacity, dtype=bool)
+        self.points = None
+        if embed_fn is not None:
+            self.points = np.empty((capacity, len(embed_fn(root))))
+        self.reset(root)
+
+    def reset(self, root):
+        """Remove all nodes and restart the tree from ``root``, keeping the allocated buffers.
+        """
+        self.num_nodes = 0
+        self.kd_tree = None
+        # number of nodes appended since the KD-tree was last built
+        self.dirty_since = 0
+        self.spatial_hash = None if self.cell_size is None else SpatialHash(self.cell_size)
+        self.append(root)
+
+    def _grow(self):
+        # double the buffers, copying the existing nodes
+        self.configs = np.concatenate([self.configs, np.empty_like(self.configs)])
+        self.parents = np.concatenate([self.parents, np.empty_like(self.parents)])
+        self.depths = np.concatenate([self.depths, np.empty_like(self.depths)])
+        self.checked = np.concatenate([self.checked, np.empty_like(self.checked)])
+        if self.points is not None:
+            self.points = np.concatenate([self.points, np.empty_like(self.points)])
+
+    def _embed(self, index):
+        self.points[index] = self.embed_fn(self.configs[index])
+        if self.spatial_hash is not None:
+            self.spatial_hash.insert(self.points[index], index)
+
+    def append(self, config, parent=-1, checked=True):
+        """Add a node and return its index.
+        """
+        index = self.num_nodes
+        if index == len(self.configs):
+            self._grow()
+        self.configs[index] = config
+        self.parents[index] = parent
+        self.depths[index] = 0 if parent == -1 else self.depths[parent] + 1
+        self.checked[index] = checked
+        if self.points is not None:
+            self._embed(index)
+            self.dirty_since += 1
+        self.num_nodes += 1
+        return index
+
+    def extend(self, qs, parent, tree_frequency=1, checked=True):
+        """Add the configurations ``qs`` as a chain of nodes starting from node ``parent``,
+        keeping every ``tree_frequency``-th configuration and the last one.
+        Returns the index of the last node added.
+        """
+        if len(qs) == 0:
+            return parent
+        qs = np.asarray(qs, dtype=float)
+        while self.num_nodes + len(qs) > len(self.configs):
+            self._grow()
+        start = self.num_nodes
+        self.num_nodes, last = append_nodes(self.configs, self.parents, self.depths, start, qs,
+                                            parent, tree_frequency)
+        self.checked[start:self.num_nodes] = checked
+        if self.points is not None:
+            for index in range(start, self.num_nodes):
+                self._embed(index)
+            self.dirty_since += self.num_nodes - start
+        return last
+
+    def nearest(self, target, distance_fn):
+        """Find the index of the node in the tree closest to ``target``.
+        """
+        num_nodes = self.num_nodes
+        if self.points is None:
+            return argmin(lambda i: distance_fn(self.configs[i], target), range(num_nodes))
+        point = np.asarray(self.embed_fn(target), dtype=float)
+        if self.spatial_hash is not None:
+            return self.spatial_hash.nearest(self.points, point)
+        if self.dirty_since > num_nodes / 2:
+            # amortized rebuild: the tree size at least doubles between two rebuilds
+            self.kd_tree = cKDTree(self.points[:num_nodes])
+            self.dirty_since = 0
+        best_distance, best_index = INF, None
+        # nodes added after the last rebuild are scanned directly
+        start = num_nodes - self.dirty_since
+        if self.kd_tree is not None:
+            distance, index = self.kd_tree.query(point)
+            if np.isfinite(distance):
+                best_distance, best_index = distance ** 2, index
+            else:
+                # the KD-tree found no point (e.g. infinite distances), scan all the nodes instead
+                start = 0
+        if start < num_nodes:
+            index = start + nearest_idx(self.points[start:], num_nodes - start, point)
+            difference = self.points[index] - point
+            if (best_index is None) or (difference.dot(difference) < best_distance):
+                best_index = index
+        return int(best_index)
+
+    def retrace(self, index):
+        """Return the configurations from the root to node ``index`` as a ``(depth + 1, d)`` array.
+        """
+        return self.configs[path_indices(self.parents, self.depths, index)]
+
+    def validate(self, index, collision_fn):
+        """Collision check the unchecked nodes from the root to node ``index``. The first node found in collision is
+        removed from the tree, together with its descendants. Returns whether the whole path is collision-free.
+        """
+        for i in path_indices(self.parents, self.depths, index):
+            if self.checked[i]:
+                continue
+            if collision_fn(self.configs[i]):
+                self.prune(i)
+                return False
+            self.checked[i] = True
+        return True
+
+    def prune(self, index):
+        """Remove node ``index`` and its descendants. The remaining nodes are compacted, so indices change.
+        """
+        assert index != 0, 'Cannot remove the root'
+        num_nodes = self.num_nodes
+        removed = subtree_mask(self.parents, num_nodes, index)
+        keep = np.flatnonzero(~removed)
+        new_from_old = np.full(num_nodes, -1, dtype=np.int32)
+        new_from_old[keep] = np.arange(len(keep))
+        parents = self.parents[keep]
+        self.num_nodes = len(keep)
+        self.configs[:self.num_nodes] = self.configs[keep]
+        self.parents[:self.num_nodes] = np.where(parents == -1, -1, new_from_old[parents])
+        self.depths[:self.num_nodes] = self.depths[keep]
+        self.checked[:self.num_nodes] = self.checked[keep]
+        if self.points is not None:
+            self.points[:self.num_nodes] = self.points[keep]
+            # the nearest neighbor structures are rebuilt from scratch
+            self.kd_tree = None
+            self.dirty_since = self.num_nodes
+            if self.spatial_hash is not None:
+                self.spatial_hash = SpatialHash(self.cell_size)
+                for i in range(self.num_nodes):
+                    self.spatial_hash.insert(self.points[i], i)
+
+    def draw(self, draw_fn, valid=True):
+        for index in range(self.num_nodes):
+            parent = self.parents[index]
+            segment = [] if parent == -1 else [self.configs[index], self.configs[parent]]
+            draw_fn(self.configs[index], segment, valid, valid)
+
+    def __len__(self):
+        return self.num_nodes
+
+
+class NodePool(object):
+    """Preallocated storage for the two trees of a bidirectional search, reused across planner restarts
+    so that each restart only resets the trees instead of allocating new buffers.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        initial number of nodes allocated per tree, by default 8192
+    """
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.trees = None
+
+    def get_trees(self, q1, q2, embed_fn=None, cell_size=None):
+        """Return two trees rooted at ``q1`` and ``q2``, reusing the pool's buffers when possible.
+        """
+        if (self.trees is None) or (self.trees[0].embed_fn is not embed_fn) or \
+                (self.trees[0].cell_size != cell_size) or (self.trees[0].configs.shape[1] != len(q1)):
+            self.trees = (Tree(q1, embed_fn=embed_fn, capacity=self.capacity, cell_size=cell_size),
+                          Tree(q2, embed_fn=embed_fn, capacity=self.capacity, cell_size=cell_size))
+        else:
+            self.trees[0].reset(q1)
+            self.trees[1].reset(q2)
+        return self.trees
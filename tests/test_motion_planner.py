@@ -130,3 +130,204 @@ def test_motion_planner(viewer, algorithm):
 
     pp.reset_simulation()
     pp.disconnect()
+
+@pytest.mark.motion_planning_2D
+@pytest.mark.parametrize("option",[
+    ('default'),
+    ('embed_fn'),
+    ('batch_collision_fn'),
+    ('cell_size'),
+    ('lazy'),
+    ('lazy_cell_size'),
+    ('goal_probability'),
+    ]
+)
+def test_rrt_connect_options(option):
+    connect(use_gui=False)
+    h = 0.1
+    base_z = h/2
+    obstacles = [
+        create_aabb_box(center=(.35, .75, base_z), extents=(.25, .25, h)),
+        create_aabb_box(center=(.75, .35, base_z), extents=(.225, .225, h)),
+        create_aabb_box(center=(.5, .5, base_z), extents=(.225, .225, h)),
+    ]
+    region = create_aabb_box(center=(.5, .5, base_z), extents=(1., 1., h))
+    start = np.array([0.,0.])
+    goal = np.array([.8,.8])
+
+    distance_fn = mp_utils.get_euclidean_distance_fn(weights=[1, 1])
+    collision_fn, _ = mp_utils.get_box_collision_fn(obstacles)
+    sample_fn, _ = mp_utils.get_box_sample_fn(region, obstacles=[], use_halton=False)
+    extend_fn, _ = mp_utils.get_box_extend_fn(obstacles=obstacles)
+
+    kwargs = {}
+    if option == 'embed_fn':
+        kwargs['embed_fn'] = lambda q: np.array(q)
+    elif option == 'cell_size':
+        kwargs['embed_fn'] = lambda q: np.array(q)
+        kwargs['cell_size'] = 0.05
+    elif option == 'batch_collision_fn':
+        kwargs['batch_collision_fn'] = lambda qs: np.array([collision_fn(q) for q in qs])
+    elif option == 'lazy':
+        kwargs['lazy'] = True
+    elif option == 'lazy_cell_size':
+        kwargs['lazy'] = True
+        kwargs['embed_fn'] = lambda q: np.array(q)
+        kwargs['cell_size'] = 0.05
+    elif option == 'goal_probability':
+        kwargs['goal_probability'] = 0.5
+
+    np.random.seed(0)
+    path = pp.rrt_connect(start, goal, distance_fn, sample_fn, extend_fn, collision_fn,
+                          max_iterations=1000, max_time=5, **kwargs)
+    # seeding np.random makes the planner reproducible
+    np.random.seed(0)
+    path_again = pp.rrt_connect(start, goal, distance_fn, sample_fn, extend_fn, collision_fn,
+                                max_iterations=1000, max_time=5, **kwargs)
+    pp.disconnect()
+
+    assert path is not None, 'No plan found!'
+    assert np.array_equal(path, path_again)
+    assert all(isinstance(q, tuple) for q in path)
+    assert np.allclose(path[0], start) and np.allclose(path[-1], goal)
+    assert not any(collision_fn(q) for q in path)
+    # consecutive configurations are at most one extension step apart
+    assert all(distance_fn(q1, q2) < 0.03 for q1, q2 in zip(path, path[1:]))
+
+def test_extend_fn_vectorized():
+    connect(use_gui=False)
+    pp.add_data_path()
+    # r2d2 has both circular (wheels) and bounded joints
+    robot = pp.load_pybullet('r2d2.urdf')
+    joints = pp.get_movable_joints(robot)
+    assert any(pp.is_circular(robot, joint) for joint in joints)
+    assert not all(pp.is_circular(robot, joint) for joint in joints)
+    extend_fn = pp.get_extend_fn(robot, joints)
+    sample_fn = pp.get_sample_fn(robot, joints)
+    np.random.seed(0)
+    pairs = [(sample_fn(), sample_fn()) for _ in range(10)]
+    # crossing the wrap-around of the circular joints
+    q1, q2 = np.array(pairs[0][0]), np.array(pairs[0][1])
+    q1[:4], q2[:4] = 3., -3.
+    pairs.append((q1, q2))
+    for q1, q2 in pairs:
+        assert np.allclose(np.array(list(extend_fn(q1, q2))), extend_fn.vectorized(q1, q2), atol=1e-12, rtol=0)
+    pp.disconnect()
+
+@pytest.mark.motion_planning_2D
+def test_rrt_kernels():
+    from pybullet_planning.motion_planners import _rrt_kernels as kernels
+    # the kernels in use (compiled if numba is installed), the plain loops and the numpy implementations
+    nearest_fns = [kernels.nearest_idx, kernels._nearest_idx, kernels._nearest_idx_numpy]
+    append_fns = [kernels.append_nodes, kernels._append_nodes, kernels._append_nodes_numpy]
+
+    results = []
+    for append_nodes in append_fns:
+        rng = np.random.default_rng(0)
+        configs = np.zeros((32, 3))
+        parents = np.full(32, -1, dtype=np.int32)
+        depths = np.zeros(32, dtype=np.int32)
+        n, last = append_nodes(configs, parents, depths, 1, rng.random((5, 3)), 0, 2)
+        n, last = append_nodes(configs, parents, depths, n, rng.random((4, 3)), 1, 1)
+        results.append((n, last, configs, parents, depths))
+    for result in results[1:]:
+        assert all(np.array_equal(value, other) for value, other in zip(results[0], result))
+
+    n, last, configs, parents, depths = results[0]
+    for target in [np.full(3, .5), configs[3], np.full(3, np.nan)]:
+        assert len({nearest_idx(configs, n, target) for nearest_idx in nearest_fns}) == 1
+    with np.errstate(over='ignore', invalid='ignore'):
+        # all the distances overflow to inf
+        assert {nearest_idx(configs * 1e200, n, np.full(3, -1e200)) for nearest_idx in nearest_fns} == {0}
+
+    assert np.array_equal(kernels.path_indices(parents, depths, last), kernels._path_indices(parents, depths, last))
+    assert np.array_equal(kernels.subtree_mask(parents, n, 1), kernels._subtree_mask(parents, n, 1))
+
+@pytest.mark.motion_planning_2D
+def test_tree_nearest_overflow():
+    from pybullet_planning.motion_planners.tree import Tree
+    # every embedded distance overflows to inf, so the KD-tree finds no point
+    tree = Tree([0., 0.], embed_fn=lambda q: np.asarray(q) * 1e160)
+    tree.append([1., 1.], parent=0)
+    with np.errstate(over='ignore', invalid='ignore'):
+        assert tree.nearest([3., 3.], None) in range(len(tree))
+
+##################################################
+# module-level functions, so that they can be sent to worker processes
+
+PARALLEL_OBSTACLES = [
+    create_aabb_box(center=(.35, .75, 0.05), extents=(.25, .25, 0.1)),
+    create_aabb_box(center=(.75, .35, 0.05), extents=(.225, .225, 0.1)),
+    create_aabb_box(center=(.5, .5, 0.05), extents=(.225, .225, 0.1)),
+]
+
+def parallel_distance_fn(q1, q2):
+    return np.linalg.norm(np.subtract(q2, q1))
+
+def parallel_sample_fn():
+    return np.random.random(2)
+
+def parallel_extend_fn(q1, q2):
+    return mp_utils.sample_line(segment=(q1, q2))
+
+def parallel_collision_fn(q, diagnosis=False):
+    return mp_utils.point_collides(q, PARALLEL_OBSTACLES)
+
+def parallel_wall_collision_fn(q, diagnosis=False):
+    # a wall separating the start from the goal
+    return .4 <= q[0] <= .6
+
+@pytest.mark.motion_planning_2D
+def test_birrt_parallel():
+    start = np.array([0.,0.])
+    goal = np.array([.8,.8])
+    path = pp.birrt(start, goal, parallel_distance_fn, parallel_sample_fn, parallel_extend_fn, parallel_collision_fn,
+                    workers=2, restarts=3, max_iterations=1000, max_time=5, smooth=20)
+    assert path is not None, 'No plan found!'
+    # smoothing removes waypoints closer than 1e-3 to their predecessor, which can drop the exact goal
+    assert np.allclose(path[0], start, atol=1e-3) and np.allclose(path[-1], goal, atol=1e-3)
+    assert not any(parallel_collision_fn(q) for q in path)
+
+@pytest.mark.motion_planning_2D
+def test_birrt_parallel_max_time():
+    start = np.array([0.,0.])
+    goal = np.array([.8,.8])
+    start_time = time.time()
+    path = pp.birrt(start, goal, parallel_distance_fn, parallel_sample_fn, parallel_extend_fn,
+                    parallel_wall_collision_fn, workers=1, restarts=3, max_iterations=INF, max_time=1)
+    assert path is None
+    # max_time bounds all the restarts together
+    assert pp.elapsed_time(start_time) < 2
+
+@pytest.mark.motion_planning_2D
+@pytest.mark.parametrize("batch",[
+    (False),
+    (True),
+    ]
+)
+def test_direct_path(batch):
+    checked = []
+    def collision_fn(q, diagnosis=False):
+        checked.append(tuple(q))
+        return parallel_wall_collision_fn(q)
+    kwargs = {}
+    if batch:
+        kwargs['batch_collision_fn'] = lambda qs: np.array([collision_fn(q) for q in qs])
+
+    # the wall is crossed by the straight line
+    start, goal = np.array([0., 0.]), np.array([1., 1.])
+    assert pp.direct_path(start, goal, parallel_extend_fn, collision_fn, **kwargs) is None
+
+    start, goal = np.array([0., 0.]), np.array([.3, .3])
+    del checked[:]
+    path = pp.direct_path(start, goal, parallel_extend_fn, collision_fn, **kwargs)
+    assert path is not None and np.allclose(path[0], start) and np.allclose(path[-1], goal)
+    # start and goal are checked once, before the interior of the path
+    assert checked[:2] == [tuple(start), tuple(goal)]
+    assert len(checked) == len(path)
+
+    del checked[:]
+    path = pp.direct_path(start, goal, parallel_extend_fn, collision_fn, _endpoints_checked=True, **kwargs)
+    assert path is not None
+    assert tuple(start) not in checked and tuple(goal) not in checked
+    assert len(checked) == len(path) - 2
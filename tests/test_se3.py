@@ -22,7 +22,7 @@ def parameters():
 def get_delta_pose_generator(epsilon=0.1, angle=np.pi/6):
     lower = [-epsilon]*3 + [-angle]*3
     upper = [epsilon]*3 + [angle]*3
-    for [x, y, z, roll, pitch, yaw] in interval_generator(lower, upper): # halton?
+    for [x, y, z, roll, pitch, yaw] in interval_generator(lower, upper, use_halton=True):
         pose = Pose(point=[x,y,z], euler=Euler(roll=roll, pitch=pitch, yaw=yaw))
         yield pose
 
@@ -48,6 +48,9 @@ def test_flying_body(viewer):
     joints = get_movable_joints(robot)
 
     path_gen_fn = get_path_gen_fn()
+    # scratch buffers reused for every pose
+    conf = np.empty(6)
+    point_diff, quat_diff = np.empty(3), np.empty(4)
     for i in range(3):
         print('Attempt: ', i)
         pose = get_pose(body)
@@ -56,15 +59,15 @@ def test_flying_body(viewer):
         for p in poses:
             point, quat = p
             euler = intrinsic_euler_from_quat(quat)
-            conf = np.concatenate([np.array(point), np.array(euler)])
+            conf[:3], conf[3:] = point, euler
             set_joint_positions(robot, joints, conf)
             set_pose(body, p)
             # draw_pose(p, length=0.1)
 
             link_pose = get_link_pose(robot, body_link)
             # draw_pose(link_pose, length=0.1)
-            assert LA.norm(np.array(point) - np.array(link_pose[0])) < 1e-6
-            assert LA.norm(np.array(quat) - np.array(link_pose[1])) < 1e-6
+            assert LA.norm(np.subtract(point, link_pose[0], out=point_diff)) < 1e-6
+            assert LA.norm(np.subtract(quat, link_pose[1], out=quat_diff)) < 1e-6
             wait_if_gui()
     wait_if_gui('Finish?')
     disconnect()